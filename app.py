@@ -2,15 +2,20 @@ from flask import Flask, render_template, request, jsonify, send_from_directory
 import numpy as np
 import io
 import time
+import os
 import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
 import multiprocessing
 from sympy import symbols, Poly, I, lambdify
 from sympy.parsing.sympy_parser import parse_expr
 
 from domains.samplers import get_sampler
 from polynomial_templates.generators import get_polynomial_generator
+from storage.root_store import RootStore, resolve_store_dir, write_roots_to_store
 
 app = Flask(__name__)
+# Server-side directory for out-of-core root stores; unset disables them
+app.config['ROOT_STORE_ROOT'] = os.environ.get('POLYNOMIOGRAM_ROOT_STORE')
 
 def find_roots_for_chunk_numpy(coeffs_chunk):
     """Find roots for a 2D array (chunk) using NumPy."""
@@ -49,11 +54,51 @@ def find_roots_parallel(coeffs_batch, max_workers=6, solver='numpy', mps_out_dig
                 results_in_chunks[index] = future.result()
             except Exception as exc:
                 print(f'Chunk {index} failed: {exc}')
-                results_in_chunks[index] = [] # Handle failure of a whole chunk
+                # Handle failure of a whole chunk, keeping one entry per pair
+                results_in_chunks[index] = [np.array([])] * len(chunks[index])
 
         # Flatten the list of lists into a single list of root arrays
         return [root for chunk_result in results_in_chunks for root in chunk_result]
 
+def find_roots_for_chunk_to_store(coeffs_chunk, store_dir, start, solver='numpy', mps_out_digits=80):
+    """Find roots for a chunk and write them straight into a memory-mapped root store."""
+    if solver == 'mpsolve':
+        roots = find_roots_for_chunk_mps(coeffs_chunk, mps_out_digits)
+    else:
+        roots = find_roots_for_chunk_numpy(coeffs_chunk)
+    write_roots_to_store(store_dir, start, roots)
+
+def find_roots_parallel_to_store(executor, coeffs_batch, store, start, max_workers=6, solver='numpy', mps_out_digits=80):
+    """Find roots for a batch in parallel, with each worker writing its rows into the store."""
+    chunks = np.array_split(coeffs_batch, max_workers)
+
+    future_to_chunk = {}
+    offset = start
+    broken = None
+    for i, chunk in enumerate(chunks):
+        try:
+            future = executor.submit(find_roots_for_chunk_to_store, chunk, str(store.directory), offset, solver, mps_out_digits)
+        except BrokenProcessPool as exc:
+            broken = exc
+            break
+        future_to_chunk[future] = i
+        offset += len(chunk)
+
+    for future in concurrent.futures.as_completed(future_to_chunk):
+        try:
+            future.result()
+        except BrokenProcessPool as exc:
+            broken = exc
+            print(f'Chunk {future_to_chunk[future]} failed: {exc}')
+        except Exception as exc:
+            # Rows of a failed chunk keep their all-invalid mask
+            print(f'Chunk {future_to_chunk[future]} failed: {exc}')
+
+    # A dead worker (e.g. a crash in the solver DLL) breaks the whole pool;
+    # let the caller replace it before the next batch
+    if broken is not None:
+        raise broken
+
 # --- Art Generation Logic (Returns Raw Root Data) ---
 def generate_root_coordinates(payload):
     """Calculates all roots and returns their raw coordinates."""
@@ -151,84 +196,113 @@ def generate_root_coordinates(payload):
     sympy_time = time.time() - sympy_start
     print(f"SymPy parsing & compilation: {sympy_time:.3f}s")
 
-    # --- Single-Pass Coefficient Calculation, Root Finding, and Post-processing ---
+    # --- Block-wise Coefficient Calculation, Root Finding, and Post-processing ---
     vector_time = 0
     roots_time = 0
     post_time = 0
 
-    # Vectorized coefficient calculation
-    vector_start = time.time()
-    
-    # 1. Calculate numeric values for all parameters
-    param_values = {}
-    for name, func in param_funcs.items():
-        # Check if the function takes one (t1 or t2) or two arguments
-        sig = list(func.__code__.co_varnames)
-        if 't1' in sig and 't2' in sig:
-             param_values[name] = func(t1_complex, t2_complex)
-        elif 't1' in sig:
-             param_values[name] = func(t1_complex)
-        else: # Must be t2
-             param_values[name] = func(t2_complex)
-
-    # 2. Use numeric parameter values to calculate final coefficients
-    ordered_param_values = [param_values[name] for name in param_symbols.keys()]
-    calculated_coeffs = coeff_calculator(*ordered_param_values)
-    
-    uniform_coeffs = []
-    for c in calculated_coeffs:
-        if np.isscalar(c):
-            uniform_coeffs.append(np.full(n_pairs, c, dtype=np.complex128))
-        else:
-            uniform_coeffs.append(c)
-    
-    all_coeffs = np.array(uniform_coeffs).T
-    vector_time = time.time() - vector_start
+    # Roots go into a fixed-layout store; with a store directory it is memory-mapped
+    # and processed in blocks so very large runs are limited by disk, not memory.
+    store_name = payload.get('root_store')
+    store_dir = None
+    try:
+        if store_name:
+            store_dir = resolve_store_dir(app.config.get('ROOT_STORE_ROOT'), store_name)
+        store = RootStore.allocate(n_pairs, degree, store_dir)
+    except (ValueError, OSError) as e:
+        return {'error': f"Root store error: {e}"}
+    block_pairs = int(payload.get('store_block_pairs', 262144)) if store_dir else n_pairs
+    block_pairs = max(1, block_pairs)
+    run_parallel = use_parallel and max_workers > 1
+    executor = None
+    if run_parallel and store_dir:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
 
-    # Root Finding
-    roots_start = time.time()
-    if use_parallel and max_workers > 1:
-        all_roots = find_roots_parallel(all_coeffs, max_workers, solver_choice, mps_out_digits)
-    else:
-        all_roots = []
-        for j in range(n_pairs):
-            try:
-                if solver_choice == 'mpsolve':
-                    from backends.mps_adapter import roots_mpsolve
-                    all_roots.append(roots_mpsolve(all_coeffs[j, :], out_digits=mps_out_digits))
+    try:
+        for start in range(0, n_pairs, block_pairs):
+            stop = min(start + block_pairs, n_pairs)
+            n_block = stop - start
+
+            # Vectorized coefficient calculation
+            vector_start = time.time()
+            t1_block = t1_complex[start:stop]
+            t2_block = t2_complex[start:stop]
+
+            # 1. Calculate numeric values for all parameters
+            param_values = {}
+            for name, func in param_funcs.items():
+                # Check if the function takes one (t1 or t2) or two arguments
+                sig = list(func.__code__.co_varnames)
+                if 't1' in sig and 't2' in sig:
+                     param_values[name] = func(t1_block, t2_block)
+                elif 't1' in sig:
+                     param_values[name] = func(t1_block)
+                else: # Must be t2
+                     param_values[name] = func(t2_block)
+
+            # 2. Use numeric parameter values to calculate final coefficients
+            ordered_param_values = [param_values[name] for name in param_symbols.keys()]
+            calculated_coeffs = coeff_calculator(*ordered_param_values)
+
+            uniform_coeffs = []
+            for c in calculated_coeffs:
+                if np.isscalar(c):
+                    uniform_coeffs.append(np.full(n_block, c, dtype=np.complex128))
                 else:
-                    all_roots.append(np.roots(all_coeffs[j, :]))
-            except Exception:
-                all_roots.append(np.array([]))
-    roots_time = time.time() - roots_start
-    
+                    uniform_coeffs.append(c)
+
+            all_coeffs = np.array(uniform_coeffs).T
+            vector_time += time.time() - vector_start
+
+            # Root Finding
+            roots_start = time.time()
+            if executor is not None:
+                try:
+                    find_roots_parallel_to_store(executor, all_coeffs, store, start, max_workers, solver_choice, mps_out_digits)
+                except BrokenProcessPool:
+                    # Unfinished rows of this block stay invalid; carry on with a fresh pool
+                    executor.shutdown(wait=False)
+                    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                if run_parallel:
+                    block_roots = find_roots_parallel(all_coeffs, max_workers, solver_choice, mps_out_digits)
+                else:
+                    block_roots = []
+                    for j in range(n_block):
+                        try:
+                            if solver_choice == 'mpsolve':
+                                from backends.mps_adapter import roots_mpsolve
+                                block_roots.append(roots_mpsolve(all_coeffs[j, :], out_digits=mps_out_digits))
+                            else:
+                                block_roots.append(np.roots(all_coeffs[j, :]))
+                        except Exception:
+                            block_roots.append(np.array([]))
+                store.write_rows(start, block_roots)
+            roots_time += time.time() - roots_start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
     # Post-processing
     post_start = time.time()
-    valid_roots = [r for r in all_roots if r.size > 0]
-    
-    if not valid_roots:
+    store.flush()
+    total_roots = store.count()
+
+    if total_roots == 0:
         return {'error': 'No valid roots found.'}
-        
-    roots_flat = np.concatenate(valid_roots)
-    x_coords = np.real(roots_flat)
-    y_coords = np.imag(roots_flat)
-    
-    mask = np.isfinite(x_coords) & np.isfinite(y_coords)
-    x_coords = x_coords[mask]
-    y_coords = y_coords[mask]
     post_time = time.time() - post_start
 
     print(f"Vectorized coefficient calculation: {vector_time:.3f}s")
     backend_name = f"MPSolve" if solver_choice == 'mpsolve' else 'NumPy'
-    print(f"Root finding ({n_pairs} pairs, {'parallel' if use_parallel and max_workers > 1 else 'sequential'}) [{backend_name}]: {roots_time:.3f}s")
+    print(f"Root finding ({n_pairs} pairs, {'parallel' if run_parallel else 'sequential'}) [{backend_name}]: {roots_time:.3f}s")
     print(f"Root finding per pair: {roots_time/n_pairs*1000:.2f}ms")
     print(f"Post-processing: {post_time:.3f}s")
 
     # --- High-Resolution Density Grid on Backend (Fast NumPy) ---
     grid_start = time.time()
     # Calculate bounds for auto-zoom
-    xlo, xhi = np.quantile(x_coords, [0.005, 0.995])
-    ylo, yhi = np.quantile(y_coords, [0.005, 0.995])
+    (xlo, xhi), (ylo, yhi) = store.quantiles([0.005, 0.995], count=total_roots)
+    xlo, xhi, ylo, yhi = float(xlo), float(xhi), float(ylo), float(yhi)
     
     # Add small padding
     x_range = xhi - xlo
@@ -251,9 +325,8 @@ def generate_root_coordinates(payload):
     yhi = y_center + max_range / 2
     
     # Create density grid using user-selected resolution
-    density_grid, x_edges, y_edges = np.histogram2d(
-        x_coords, y_coords, 
-        bins=grid_size, 
+    density_grid, x_edges, y_edges = store.histogram2d(
+        bins=grid_size,
         range=[[xlo, xhi], [ylo, yhi]]
     )
     
@@ -277,7 +350,8 @@ def generate_root_coordinates(payload):
         'density_grid': density_list,
         'grid_size': grid_size,
         'bounds': {'x_min': xlo, 'x_max': xhi, 'y_min': ylo, 'y_max': yhi},
-        'total_roots': len(x_coords),
+        'total_roots': total_roots,
+        'root_store': store_name if store_dir is not None else None,
         'timing': {
             'total': total_time,
             'sympy': sympy_time,
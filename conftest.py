@@ -0,0 +1 @@
+# Root conftest: lets a bare `pytest` import the top-level packages (storage, domains, ...)
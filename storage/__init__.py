@@ -0,0 +1 @@
+# Marker for storage package
@@ -0,0 +1,179 @@
+import math
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+
+_RE_FILE = 'roots_re.npy'
+_IM_FILE = 'roots_im.npy'
+_VALID_FILE = 'roots_valid.npy'
+
+
+class RootStore:
+    """Fixed-layout root storage: (n_pairs, degree) float32 re/im plus a validity mask.
+
+    Backed by plain arrays when no directory is given, or by memory-mapped
+    .npy files so that very large runs are limited by disk rather than RAM.
+    """
+
+    def __init__(self, re, im, valid, directory=None):
+        self.re = re
+        self.im = im
+        self.valid = valid
+        self.directory = Path(directory) if directory is not None else None
+
+    @classmethod
+    def allocate(cls, n_pairs, degree, directory=None):
+        """Create an empty store, memory-mapped under `directory` if given."""
+        shape = (int(n_pairs), max(0, int(degree)))
+        if directory is None:
+            return cls(np.zeros(shape, dtype=np.float32),
+                       np.zeros(shape, dtype=np.float32),
+                       np.zeros(shape, dtype=bool))
+
+        directory = Path(directory)
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        # Creating the directory is the claim on the name: an earlier run's roots
+        # (or a run still in progress) are never truncated.
+        try:
+            directory.mkdir()
+        except FileExistsError:
+            raise ValueError(f"Root store '{directory.name}' already exists.")
+        free = shutil.disk_usage(directory).free
+        if store_nbytes(*shape) > free:
+            directory.rmdir()
+            raise ValueError(f"Root store needs {store_nbytes(*shape)} bytes but only {free} are free.")
+        open_memmap = np.lib.format.open_memmap
+        re = open_memmap(directory / _RE_FILE, mode='w+', dtype=np.float32, shape=shape)
+        im = open_memmap(directory / _IM_FILE, mode='w+', dtype=np.float32, shape=shape)
+        valid = open_memmap(directory / _VALID_FILE, mode='w+', dtype=bool, shape=shape)
+        return cls(re, im, valid, directory)
+
+    @classmethod
+    def open(cls, directory, mode='r'):
+        """Open an existing memory-mapped store (use mode='r+' to write)."""
+        directory = Path(directory)
+        return cls(np.load(directory / _RE_FILE, mmap_mode=mode),
+                   np.load(directory / _IM_FILE, mmap_mode=mode),
+                   np.load(directory / _VALID_FILE, mmap_mode=mode),
+                   directory)
+
+    @property
+    def n_pairs(self):
+        return self.re.shape[0]
+
+    @property
+    def degree(self):
+        return self.re.shape[1]
+
+    def write_rows(self, start, roots_list):
+        """Write one root array per pair into consecutive rows beginning at `start`."""
+        if len(roots_list) and all(len(r) == self.degree for r in roots_list):
+            # Fast path: every pair has a full set of roots, so write the block at once
+            re, im = _to_float32(np.concatenate(roots_list).reshape(len(roots_list), self.degree))
+            stop = start + len(roots_list)
+            self.re[start:stop] = re
+            self.im[start:stop] = im
+            self.valid[start:stop] = np.isfinite(re) & np.isfinite(im)
+            return
+
+        for offset, roots in enumerate(roots_list):
+            row = start + offset
+            roots = np.asarray(roots).ravel()[:self.degree]
+            n = roots.size
+            re, im = _to_float32(roots)
+            self.re[row, :n] = re
+            self.im[row, :n] = im
+            # Roots that overflow float32 or came back non-finite are masked out
+            self.valid[row, :n] = np.isfinite(re) & np.isfinite(im)
+            self.valid[row, n:] = False
+
+    def flush(self):
+        for arr in (self.re, self.im, self.valid):
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+    def iter_slices(self, slice_pairs=65536):
+        """Yield (x, y) float32 coordinates of valid roots, a slice of pairs at a time."""
+        for start in range(0, self.n_pairs, slice_pairs):
+            stop = min(start + slice_pairs, self.n_pairs)
+            valid = np.asarray(self.valid[start:stop])
+            yield (np.asarray(self.re[start:stop])[valid],
+                   np.asarray(self.im[start:stop])[valid])
+
+    def count(self, slice_pairs=65536):
+        """Number of valid roots in the store."""
+        total = 0
+        for start in range(0, self.n_pairs, slice_pairs):
+            total += int(np.count_nonzero(self.valid[start:start + slice_pairs]))
+        return total
+
+    def quantiles(self, q, count=None, max_samples=5_000_000, slice_pairs=65536):
+        """Quantiles of the x and y coordinates.
+
+        Exact when the store holds at most `max_samples` valid roots; otherwise
+        estimated from every k-th pair (all of its roots) so memory stays bounded.
+        Pass `count` if it is already known to avoid another pass over the mask.
+        """
+        if count is None:
+            count = self.count(slice_pairs)
+        if count == 0:
+            raise ValueError('Root store holds no valid roots.')
+        # Sampling whole pairs keeps every root slot; a stride over the flattened
+        # roots would alias with the degree and drop whole branches.
+        pair_stride = max(1, math.ceil(count / max_samples))
+        xs, ys = [], []
+        for start in range(0, self.n_pairs, slice_pairs):
+            stop = min(start + slice_pairs, self.n_pairs)
+            first = start + (-start) % pair_stride
+            valid = np.asarray(self.valid[first:stop:pair_stride])
+            xs.append(np.asarray(self.re[first:stop:pair_stride])[valid])
+            ys.append(np.asarray(self.im[first:stop:pair_stride])[valid])
+        x_all = np.concatenate(xs) if xs else np.empty(0, dtype=np.float32)
+        y_all = np.concatenate(ys) if ys else np.empty(0, dtype=np.float32)
+        return np.quantile(x_all, q), np.quantile(y_all, q)
+
+    def histogram2d(self, bins, range, slice_pairs=65536):
+        """Accumulate a 2D histogram of the valid roots slice by slice."""
+        grid = np.zeros((bins, bins), dtype=np.float64)
+        x_edges = y_edges = None
+        for x, y in self.iter_slices(slice_pairs):
+            counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=range)
+            grid += counts
+        if x_edges is None:
+            x_edges = np.linspace(range[0][0], range[0][1], bins + 1)
+            y_edges = np.linspace(range[1][0], range[1][1], bins + 1)
+        return grid, x_edges, y_edges
+
+
+def _to_float32(roots):
+    # Roots beyond float32 range become inf here and are masked out by the caller
+    with np.errstate(over='ignore', invalid='ignore'):
+        return np.real(roots).astype(np.float32), np.imag(roots).astype(np.float32)
+
+
+def resolve_store_dir(root, name):
+    """Resolve a client-chosen store name to a directory under the server's store root."""
+    if root is None:
+        raise ValueError('Out-of-core root store is not enabled on this server.')
+    root = Path(root).resolve()
+    name = str(name)
+    if not name or Path(name).is_absolute():
+        raise ValueError('Root store name must be a relative directory name.')
+    directory = (root / name).resolve()
+    if directory == root or not directory.is_relative_to(root):
+        raise ValueError('Root store name must stay inside the store root.')
+    return directory
+
+
+def store_nbytes(n_pairs, degree):
+    """Disk space needed by a store: float32 re and im plus a one-byte mask per slot."""
+    return int(n_pairs) * max(0, int(degree)) * 9
+
+
+def write_roots_to_store(directory, start, roots_list):
+    """Open a memory-mapped store in a worker process and write rows into it."""
+    store = RootStore.open(directory, mode='r+')
+    store.write_rows(start, roots_list)
+    store.flush()
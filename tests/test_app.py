@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+import app as app_module
+from app import app, generate_root_coordinates
+
+
+def _payload(**overrides):
+    payload = {
+        'degree': 5,
+        'terms': [{'k': 5, 'coeff': '1'}, {'k': 3, 'coeff': 'a'}, {'k': 0, 'coeff': 'b'}],
+        'params': {'a': {'type': 'freeform', 'definition': 't1'},
+                   'b': {'type': 'freeform', 'definition': 't2**2'}},
+        'n_pairs': 3000,
+        'seed': 7,
+        'grid_resolution': 64,
+        'max_workers': 1,
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _baseline(payload):
+    # The pre-store pipeline: concatenate every pair's roots in float64
+    t1 = np.exp(1j * np.random.default_rng(7).uniform(0, 2 * np.pi, payload['n_pairs']))
+    t2 = np.exp(1j * np.random.default_rng(8).uniform(0, 2 * np.pi, payload['n_pairs']))
+    roots = np.concatenate([np.roots([1, 0, a, 0, 0, b ** 2]) for a, b in zip(t1, t2)])
+    return roots.real, roots.imag
+
+
+@pytest.fixture
+def store_root(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ROOT_STORE_ROOT', str(tmp_path))
+    return tmp_path
+
+
+def test_store_paths_match_in_memory_and_baseline(store_root):
+    in_memory = generate_root_coordinates(_payload())
+    sequential = generate_root_coordinates(_payload(root_store='seq', store_block_pairs=701))
+    parallel = generate_root_coordinates(_payload(root_store='par', store_block_pairs=1000, max_workers=3))
+
+    x, y = _baseline(_payload())
+    assert in_memory['total_roots'] == x.size
+    (xlo, xhi), (ylo, yhi) = np.quantile(x, [0.005, 0.995]), np.quantile(y, [0.005, 0.995])
+    for result in (in_memory, sequential, parallel):
+        assert result['total_roots'] == in_memory['total_roots']
+        assert result['bounds'] == in_memory['bounds']
+        assert result['density_grid'] == in_memory['density_grid']
+    # float32 storage only perturbs the auto-zoom bounds at single precision
+    bounds = in_memory['bounds']
+    assert np.isclose((bounds['x_min'] + bounds['x_max']) / 2, (xlo + xhi) / 2, atol=1e-5)
+    assert np.isclose((bounds['y_min'] + bounds['y_max']) / 2, (ylo + yhi) / 2, atol=1e-5)
+
+    assert sequential['root_store'] == 'seq'
+    assert in_memory['root_store'] is None
+    assert (store_root / 'par' / 'roots_re.npy').exists()
+
+
+def test_existing_store_name_is_refused(store_root):
+    assert 'error' not in generate_root_coordinates(_payload(root_store='run'))
+    result = generate_root_coordinates(_payload(root_store='run', n_pairs=10))
+    assert result == {'error': "Root store error: Root store 'run' already exists."}
+
+
+def test_store_disabled_without_server_root(monkeypatch):
+    monkeypatch.setitem(app.config, 'ROOT_STORE_ROOT', None)
+    result = generate_root_coordinates(_payload(root_store='run'))
+    assert 'not enabled' in result['error']
+
+
+_real_chunk_to_store = app_module.find_roots_for_chunk_to_store
+
+
+def _crash_on_first_block(coeffs_chunk, store_dir, start, *args):
+    if start == 0:
+        os._exit(1)
+    _real_chunk_to_store(coeffs_chunk, store_dir, start, *args)
+
+
+def test_broken_worker_pool_leaves_rows_invalid(store_root, monkeypatch):
+    monkeypatch.setattr(app_module, 'find_roots_for_chunk_to_store', _crash_on_first_block)
+    result = generate_root_coordinates(_payload(root_store='run', store_block_pairs=1000, max_workers=2))
+    # The first block is lost with the dead pool; later blocks run on a fresh one
+    assert 'error' not in result
+    assert 5 * 2000 <= result['total_roots'] < 5 * 3000
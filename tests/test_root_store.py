@@ -0,0 +1,142 @@
+import concurrent.futures
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from storage import root_store
+from storage.root_store import RootStore, resolve_store_dir, write_roots_to_store
+
+
+def _aliasing_store(n_pairs=2000, degree=8, seed=0):
+    # x^8 + 30*a*x^4 + 0.01*(b+1): np.roots returns the slots in a systematic
+    # order, so a stride over the flattened roots that shares a factor with
+    # the degree keeps picking the same branch.
+    rng = np.random.default_rng(seed)
+    a = np.exp(1j * rng.uniform(0, 2 * np.pi, n_pairs))
+    b = np.exp(1j * rng.uniform(0, 2 * np.pi, n_pairs))
+    store = RootStore.allocate(n_pairs, degree)
+    roots = []
+    for ai, bi in zip(a, b):
+        coeffs = np.zeros(degree + 1, dtype=np.complex128)
+        coeffs[0] = 1
+        coeffs[4] = 30 * ai
+        coeffs[8] = 0.01 * (bi + 1)
+        roots.append(np.roots(coeffs))
+    store.write_rows(0, roots)
+    return store
+
+
+@pytest.mark.parametrize('max_samples', [2000, 1000])
+def test_subsampled_quantiles_match_exact(max_samples):
+    store = _aliasing_store()
+    q = [0.005, 0.995]
+    count = store.count()
+    # Flattened strides of 8 and 16 used to alias with degree 8
+    assert count // max_samples in (8, 16)
+
+    exact_x, exact_y = store.quantiles(q, count=count, max_samples=count)
+    approx_x, approx_y = store.quantiles(q, count=count, max_samples=max_samples, slice_pairs=37)
+
+    span = exact_x[1] - exact_x[0]
+    assert np.allclose(approx_x, exact_x, atol=0.05 * span)
+    assert np.allclose(approx_y, exact_y, atol=0.05 * span)
+
+
+def test_resolve_store_dir_stays_under_root(tmp_path):
+    assert resolve_store_dir(tmp_path, 'run1') == (tmp_path / 'run1').resolve()
+    for name in ['', '..', '../escape', 'a/../../escape', str(tmp_path / 'abs')]:
+        with pytest.raises(ValueError):
+            resolve_store_dir(tmp_path, name)
+    with pytest.raises(ValueError):
+        resolve_store_dir(None, 'run1')
+
+
+def test_allocate_open_round_trip(tmp_path):
+    store = RootStore.allocate(4, 3, tmp_path / 'run')
+    store.write_rows(0, [np.array([1 + 2j, 3 - 4j, -5j])] * 4)
+    store.flush()
+
+    reopened = RootStore.open(tmp_path / 'run')
+    assert (reopened.n_pairs, reopened.degree) == (4, 3)
+    assert reopened.count() == 12
+    assert np.array_equal(reopened.re[2], np.float32([1, 3, 0]))
+    assert np.array_equal(reopened.im[2], np.float32([2, -4, -5]))
+
+
+def test_allocate_refuses_existing_store(tmp_path):
+    first = RootStore.allocate(10, 2, tmp_path / 'run')
+    first.write_rows(0, [np.array([1j, 2j])] * 10)
+    with pytest.raises(ValueError, match='already exists'):
+        RootStore.allocate(3, 2, tmp_path / 'run')
+    # The earlier run is left intact
+    assert first.count() == 20
+    assert RootStore.open(tmp_path / 'run').count() == 20
+
+
+def test_allocate_refuses_when_disk_is_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(root_store.shutil, 'disk_usage', lambda path: SimpleNamespace(free=100))
+    with pytest.raises(ValueError, match='free'):
+        RootStore.allocate(100, 10, tmp_path / 'run')
+    assert not (tmp_path / 'run').exists()
+
+
+def test_write_rows_masks_invalid_and_short_rows():
+    store = RootStore.allocate(5, 3)
+    store.write_rows(0, [np.array([1, 2, 3], dtype=complex)] * 5)
+    store.write_rows(1, [
+        np.array([np.nan, 1j, np.inf]),
+        np.array([1e39, 2 + 1e39j, 1.0]),   # overflows float32
+        np.array([4j]),
+        np.array([]),
+    ])
+    assert store.valid[0].tolist() == [True, True, True]
+    assert store.valid[1].tolist() == [False, True, False]
+    assert store.valid[2].tolist() == [False, False, True]
+    # Short and empty rows clear the slots left over from the earlier write
+    assert store.valid[3].tolist() == [True, False, False]
+    assert store.valid[4].tolist() == [False, False, False]
+    assert store.count() == 6
+
+
+def test_write_rows_fast_path_matches_loop():
+    rng = np.random.default_rng(1)
+    roots = [rng.normal(size=4) + 1j * rng.normal(size=4) for _ in range(50)]
+    roots[7][2] = np.inf
+    fast = RootStore.allocate(50, 4)
+    fast.write_rows(0, roots)
+    # A trailing short row forces the per-pair loop
+    slow = RootStore.allocate(51, 4)
+    slow.write_rows(0, roots + [np.array([1j])])
+    assert np.array_equal(fast.re, slow.re[:50])
+    assert np.array_equal(fast.im, slow.im[:50])
+    assert np.array_equal(fast.valid, slow.valid[:50])
+
+
+def test_histogram2d_matches_numpy_across_slices():
+    store = _aliasing_store(n_pairs=500)
+    valid = store.valid
+    x, y = store.re[valid], store.im[valid]
+    bounds = [[-3, 3], [-3, 3]]
+    expected, x_edges, y_edges = np.histogram2d(x, y, bins=32, range=bounds)
+    grid, gx, gy = store.histogram2d(bins=32, range=bounds, slice_pairs=37)
+    assert np.array_equal(grid, expected)
+    assert np.allclose(gx, x_edges) and np.allclose(gy, y_edges)
+
+
+def test_quantiles_of_empty_store_raise():
+    store = RootStore.allocate(10, 3)
+    with pytest.raises(ValueError, match='no valid roots'):
+        store.quantiles([0.5])
+
+
+def test_write_roots_to_store_from_worker(tmp_path):
+    store = RootStore.allocate(6, 2, tmp_path / 'run')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(write_roots_to_store, str(tmp_path / 'run'), start,
+                                   [np.array([start + 1j, -1.0])] * 3)
+                   for start in (0, 3)]
+        for future in futures:
+            future.result()
+    assert store.count() == 12
+    assert np.array_equal(RootStore.open(tmp_path / 'run').re[:, 0], np.float32([0, 0, 0, 3, 3, 3]))